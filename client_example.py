@@ -5,14 +5,22 @@ This script demonstrates how to connect to an MCP server and use its tools.
 """
 
 import asyncio
+import concurrent.futures
 import sys
+import threading
 import argparse
-import json
 import shlex
+import time
+import weakref
+import anyio
+import orjson
+from contextlib import asynccontextmanager
 from typing import Any, Dict, List, Optional, Union
+from pydantic import ValidationError
 from mcp.client.session import ClientSession
 from mcp.client.sse import sse_client
 from mcp.client.stdio import StdioServerParameters, stdio_client
+from mcp.types import CallToolResult, TextContent
 import os
 from pathlib import Path
 import shutil
@@ -25,7 +33,8 @@ from models import (
     AddDocumentRequest, 
     AddDocumentResponse,
     SearchRequest,
-    DocumentStatus
+    DocumentStatus,
+    parse_model
 )
 
 
@@ -45,6 +54,79 @@ def print_items(name: str, result: Any) -> None:
         print("  No items available")
 
 
+# Environment passed to stdio servers, copied once at import. StdioServerParameters(env=None)
+# would only forward a small allow-list of variables, not the full parent environment.
+_BASE_ENV = os.environ.copy()
+
+# Tools whose results only depend on their arguments and the knowledge base contents
+_CACHEABLE_TOOLS = frozenset({"list_documents", "rag_search"})
+
+# Tools that change the knowledge base, so cached results are dropped after they succeed
+_WRITE_TOOLS = frozenset({"add_document", "add_documents"})
+
+# Cached tool results per session (so different servers never share results), each keyed
+# by (tool name, canonical JSON arguments); entries go away with their session
+_TOOL_CACHE: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+
+async def cached_call(session, name: str, arguments: Optional[Dict[str, Any]] = None, ttl: float = 30):
+    """Call a tool, serving repeated read-only calls from a local cache.
+    
+    A successful write through this function clears the cache.
+    
+    Args:
+        session: Initialized MCP client session
+        name: Tool name
+        arguments: Tool arguments
+        ttl: Seconds a cached result stays valid
+        
+    Returns:
+        The tool call result
+    """
+    if name not in _CACHEABLE_TOOLS:
+        result = await session.call_tool(name, arguments=arguments)
+        if name in _WRITE_TOOLS and not getattr(result, 'isError', False):
+            invalidate_tool_cache()
+        return result
+    
+    session_cache = _TOOL_CACHE.setdefault(session, {})
+    key = (name, orjson.dumps(arguments or {}, option=orjson.OPT_SORT_KEYS))
+    cached = session_cache.get(key)
+    if cached is not None and time.monotonic() - cached[0] < ttl:
+        return cached[1]
+    
+    result = await session.call_tool(name, arguments=arguments)
+    # Don't cache failures so the next call retries
+    if not getattr(result, 'isError', False):
+        session_cache[key] = (time.monotonic(), result)
+    return result
+
+
+def invalidate_tool_cache() -> None:
+    """Drop cached results that depend on the knowledge base contents."""
+    _TOOL_CACHE.clear()
+
+
+# Declared field names per model class, looked up once rather than per formatted row
+_DISPLAY_FIELDS: Dict[type, tuple] = {DocumentMetadata: tuple(DocumentMetadata.model_fields)}
+
+
+def _meta_kv(md: DocumentMetadata) -> str:
+    """Format the set metadata fields as "key: value" pairs for display.
+    
+    Reads the field values directly instead of serializing the model.
+    """
+    model_class = type(md)
+    fields = _DISPLAY_FIELDS.get(model_class)
+    if fields is None:
+        fields = _DISPLAY_FIELDS[model_class] = tuple(model_class.model_fields)
+    values = md.__dict__
+    pairs = [f"{k}: {values[k]}" for k in fields if values[k]]
+    if md.model_extra:
+        pairs.extend(f"{k}: {v}" for k, v in md.model_extra.items() if v)
+    return ", ".join(pairs)
+
+
 # Helper function to convert response to models
 def parse_response(response, model_class):
     """Parse MCP response into Pydantic models.
@@ -56,37 +138,47 @@ def parse_response(response, model_class):
     Returns:
         List of model instances or single model instance
     """
-    # Handle ContentObject response (with TextContent)
-    if hasattr(response, 'content') and hasattr(response, 'meta'):
+    # Handle tool call result (with TextContent)
+    if isinstance(response, CallToolResult):
         content_items = response.content
         
         # Handle empty response
         if not content_items:
             return []
             
+        # Common case: one text item carries the whole payload, so return the
+        # validated model (or list) as-is instead of regrowing a results list
+        if len(content_items) == 1 and isinstance(content_items[0], TextContent):
+            text = content_items[0].text
+            # Plain-text replies (like echo) can't be JSON objects or arrays
+            if not text or text[0] not in "[{":
+                return None
+            try:
+                parsed = parse_model(model_class, text)
+            except ValidationError as e:
+                print(f"Error parsing response: {e}")
+                return None
+            if isinstance(parsed, list):
+                return parsed if len(parsed) > 1 else parsed[0] if parsed else None
+            return parsed
+            
         # Parse text content into models
         results = []
         for content_item in content_items:
-            if hasattr(content_item, 'text') and content_item.text:
+            if isinstance(content_item, TextContent) and content_item.text:
+                # For some tools (like echo), the response is plain text rather than
+                # JSON; skip it without going through the parser's error path
+                if content_item.text[0] not in "[{":
+                    continue
                 try:
-                    # For some tools (like echo), the response might not be JSON
-                    if content_item.text.startswith('Echo:'):
-                        # Special handling for echo tool responses
-                        continue
-                        
-                    # Parse JSON text into dict
-                    data = json.loads(content_item.text)
-                    # Convert dict to model
-                    if isinstance(data, list):
-                        for item in data:
-                            results.append(model_class(**item))
+                    # Validate the JSON text straight into models in a single pass
+                    parsed = parse_model(model_class, content_item.text)
+                    if isinstance(parsed, list):
+                        results.extend(parsed)
                     else:
-                        results.append(model_class(**data))
-                except json.JSONDecodeError as e:
+                        results.append(parsed)
+                except ValidationError as e:
                     print(f"Error parsing response: {e}")
-                    # Don't treat as an error for non-JSON responses from tools like echo
-                except (TypeError, ValueError) as e:
-                    print(f"Error parsing model: {e}")
         
         return results if len(results) > 1 else results[0] if results else None
     
@@ -108,6 +200,135 @@ def parse_response(response, model_class):
     return response
 
 
+@asynccontextmanager
+async def open_session(server_url: str):
+    """Open an initialized MCP client session over SSE.
+    
+    Args:
+        server_url: URL of the MCP server's SSE endpoint
+        
+    Yields:
+        Initialized MCP client session
+    """
+    async with sse_client(server_url) as streams:
+        print("Stream connection established, initializing session...")
+        async with ClientSession(streams[0], streams[1]) as session:
+            await session.initialize()
+            yield session
+
+
+class ClientHandle:
+    """Synchronous handle on a single long-lived SSE session.
+    
+    The session lives on a private event loop in a background thread, so
+    scripts that import this module can make many calls through one
+    connection instead of reconnecting inside a fresh asyncio.run() each time.
+    
+    Usage:
+        with ClientHandle("http://localhost:8000/sse") as client:
+            client.call_tool("rag_search", {"query": "What is MCP?"})
+    """
+    
+    def __init__(self, server_url: str):
+        self.server_url = server_url
+        self._loop = None
+        self._thread = None
+        self._runner = None
+        self._session = None
+        self._closed = None
+    
+    def __enter__(self):
+        self._start()
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+    
+    def _start(self):
+        """Start the background loop and connect, if not already connected.
+        
+        If the session has ended on its own (e.g. the server went away), the old
+        loop is torn down and a new connection is opened.
+        """
+        if self._loop is not None:
+            if not self._runner.done():
+                return
+            self._stop_loop()
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="mcp-client", daemon=True)
+        self._thread.start()
+        
+        ready = concurrent.futures.Future()
+        self._runner = asyncio.run_coroutine_threadsafe(self._hold_session(ready), self._loop)
+        try:
+            ready.result()
+        except BaseException:
+            self._stop_loop()
+            raise
+    
+    async def _hold_session(self, ready):
+        """Keep the session open until close() is called.
+        
+        The SSE transport's task group has to be entered and exited by the same
+        task, so one task owns the session for its whole lifetime.
+        """
+        self._closed = asyncio.Event()
+        try:
+            async with open_session(self.server_url) as session:
+                self._session = session
+                ready.set_result(None)
+                await self._closed.wait()
+        except BaseException as e:
+            if not ready.done():
+                ready.set_exception(e)
+            raise
+        finally:
+            self._session = None
+    
+    def _run(self, func, *args):
+        """Run func(session, *args) on the background loop and wait for the result."""
+        self._start()
+        session = self._session
+        if session is None:
+            raise ConnectionError(f"MCP session to {self.server_url} has closed")
+        try:
+            return asyncio.run_coroutine_threadsafe(func(session, *args), self._loop).result()
+        except (anyio.ClosedResourceError, anyio.BrokenResourceError) as e:
+            # The transport is gone but the session is still open; drop it so the next call
+            # reconnects. Not retried here, since the call may already have reached the server.
+            self.close()
+            raise ConnectionError(f"Lost the MCP session to {self.server_url}; the next call reconnects") from e
+    
+    def call_tool(self, name: str, arguments: Optional[Dict[str, Any]] = None):
+        """Call a tool, serving read-only tools from the client cache."""
+        return self._run(cached_call, name, arguments)
+    
+    def read_resource(self, uri: str):
+        """Read a resource from the server."""
+        return self._run(ClientSession.read_resource, uri)
+    
+    def close(self):
+        """Close the session and stop the background loop."""
+        if self._loop is None:
+            return
+        self._loop.call_soon_threadsafe(self._closed.set)
+        try:
+            self._runner.result()
+        except Exception as e:
+            # A dropped connection was already reported to the call that hit it
+            print(f"⚠️ MCP session to {self.server_url} ended with an error: {e}")
+        finally:
+            self._stop_loop()
+    
+    def _stop_loop(self):
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._loop = None
+        self._thread = None
+        self._runner = None
+
+
 async def run_sse_client(server_url: str):
     """Run MCP client in SSE mode.
     
@@ -117,14 +338,11 @@ async def run_sse_client(server_url: str):
     print(f"Connecting to MCP server at {server_url} via SSE...")
     
     try:
-        async with sse_client(server_url) as streams:
-            print("Stream connection established, initializing session...")
-            async with ClientSession(streams[0], streams[1]) as session:
-                await session.initialize()
-                print("✅ Connected to MCP server!")
-                
-                # Run the common client operations
-                await run_client_operations(session)
+        async with open_session(server_url) as session:
+            print("✅ Connected to MCP server!")
+            
+            # Run the common client operations
+            await run_client_operations(session)
                 
     except Exception as e:
         print(f"❌ Error connecting to MCP server: {e}")
@@ -150,7 +368,7 @@ async def run_stdio_client(command: str, args: List[str] = None):
         params = StdioServerParameters(
             command=command,
             args=args,
-            env=os.environ.copy()
+            env=_BASE_ENV
         )
         
         # Connect to the server via stdio
@@ -196,76 +414,174 @@ async def add_document_with_metadata(session, content, metadata_dict):
         # Create metadata object
         metadata = DocumentMetadata(**metadata_dict)
         
-        # Create request
-        request = AddDocumentRequest(
-            content=content,
-            metadata=metadata.model_dump(exclude_none=True, exclude_unset=True)
-        )
+        # Create request; the metadata was validated above, so skip re-validation
+        request = AddDocumentRequest.model_construct(content=content, metadata=metadata)
         
         # Call the tool
         doc_result = await session.call_tool(
             "add_document", 
-            arguments=request.model_dump(exclude_none=True, exclude_unset=True)
+            arguments=request.model_dump(mode="json", exclude_none=True, exclude_unset=True)
         )
         
         # Parse response
         response = parse_response(doc_result, AddDocumentResponse)
-        if response:
-            if response.status == DocumentStatus.SUCCESS:
-                print(f"Document added with ID: {response.id}")
-                return True
-            elif response.status == DocumentStatus.DUPLICATE:
-                print(f"Document already exists with ID: {response.id}")
-                print(f"Note: {response.message}")
-                return True  # Still consider this successful
-            else:
-                print(f"❌ Document add failed: {getattr(response, 'message', 'Unknown error')}")
-                return False
-        else:
-            print(f"❌ Document add failed: Unknown response")
-            return False
+        added = report_add_response(response)
+        if added:
+            invalidate_tool_cache()
+        return added
     except Exception as e:
         print(f"❌ Error adding document: {e}")
         return False
 
 
-async def run_client_operations(session: ClientSession):
-    """Run common client operations with the provided session.
+def report_add_response(response) -> bool:
+    """Print the outcome of a single document insert.
+    
+    Args:
+        response: Parsed AddDocumentResponse (or None if parsing failed)
+        
+    Returns:
+        True if the document was added or already existed, False otherwise
+    """
+    if response:
+        if response.status == DocumentStatus.SUCCESS:
+            print(f"Document added with ID: {response.id}")
+            return True
+        elif response.status == DocumentStatus.DUPLICATE:
+            print(f"Document already exists with ID: {response.id}")
+            print(f"Note: {response.message}")
+            return True  # Still consider this successful
+        else:
+            print(f"❌ Document add failed: {getattr(response, 'message', 'Unknown error')}")
+            return False
+    else:
+        print(f"❌ Document add failed: Unknown response")
+        return False
+
+
+async def add_documents_bulk(session, items):
+    """Add several documents to the knowledge base in a single tool call.
+    
+    Falls back to one add_document call per item if the server does not
+    provide the add_documents tool.
+    
+    Args:
+        session: Initialized MCP client session
+        items: List of (content, metadata_dict) tuples
+        
+    Returns:
+        List of booleans, True for each document that was added or already existed
+    """
+    try:
+        requests = [
+            AddDocumentRequest.model_construct(
+                content=content,
+                metadata=DocumentMetadata(**metadata_dict)
+            ).model_dump(mode="json", exclude_none=True, exclude_unset=True)
+            for content, metadata_dict in items
+        ]
+        
+        # Send every document in one round trip
+        bulk_result = await session.call_tool("add_documents", arguments={"items": requests})
+        
+        # Older servers only know add_document, so insert one by one instead
+        if bulk_result.isError and any(isinstance(c, TextContent) and "Unknown tool" in c.text for c in bulk_result.content):
+            print("Server has no add_documents tool, adding documents one at a time")
+            return list(await asyncio.gather(*[
+                add_document_with_metadata(session, content, metadata_dict)
+                for content, metadata_dict in items
+            ]))
+        
+        # Parse response
+        responses = parse_response(bulk_result, AddDocumentResponse)
+        if not isinstance(responses, list):
+            responses = [responses] if responses else []
+        if len(responses) != len(items):
+            print(f"❌ Bulk add returned {len(responses)} results for {len(items)} documents")
+            return [False] * len(items)
+        added = [report_add_response(response) for response in responses]
+        if any(added):
+            invalidate_tool_cache()
+        return added
+    except Exception as e:
+        print(f"❌ Error adding documents: {e}")
+        return [False] * len(items)
+
+
+async def read_resource_prefix(session, uri: str, limit: int = 200):
+    """Read at most `limit` characters of a text resource.
+    
+    MCP's resources/read has no range or streaming parameter, so the server
+    still sends the whole resource. Only the prefix is kept, though, so the
+    client never joins or copies the full text.
     
     Args:
         session: Initialized MCP client session
+        uri: URI of the resource to read
+        limit: Maximum number of characters to return
+        
+    Returns:
+        Tuple of (text prefix, mime type, whether the text was truncated)
     """
-    # List available tools, resources, and prompts
-    print_items("tools", (await session.list_tools()))
-    print_items("resources", (await session.list_resources()))
-    print_items("prompts", (await session.list_prompts()))
+    result = await session.read_resource(uri)
     
-    # Call the echo tool
-    echo_result = await session.call_tool("echo", arguments={"message": "Hello, MCP!"})
-    print(f"\nEcho result: {echo_result}")
+    parts = []
+    size = 0
+    mime_type = None
+    for item in result.contents:
+        text = getattr(item, 'text', None)
+        if text is None:
+            continue
+        if mime_type is None:
+            mime_type = item.mimeType
+        remaining = limit - size
+        if len(text) > remaining:
+            parts.append(text[:remaining])
+            return "".join(parts), mime_type, True
+        parts.append(text)
+        size += len(text)
     
-    await add_document_with_metadata(
-        session,
-        "Thinklytics is a blog series for strategic thinking and decisions making via data analytics.",
-        {"source": "documentation", "topic": "Blog Series"}
-    )
+    return "".join(parts), mime_type, False
 
-    await add_document_with_metadata(
-        session,
-        "MCP (Model Context Protocol) is a protocol that allows AI models to interact with external tools and data sources.",
-        {"source": "documentation", "topic": "MCP"}
-    )
 
+async def run_client_operations(session: ClientSession):
+    """Run common client operations with the provided session.
     
-    await add_document_with_metadata(
-        session,
-        "RAG (Retrieval-Augmented Generation) is a technique that combines the generative capabilities of large language models with information retrieval systems.",
-        {"source": "documentation", "topic": "RAG"}
+    Args:
+        session: Initialized MCP client session
+    """
+    # List available tools, resources, and prompts and call the echo tool
+    # concurrently, since none of these requests depend on each other
+    tools, resources, prompts, echo_result = await asyncio.gather(
+        session.list_tools(),
+        session.list_resources(),
+        session.list_prompts(),
+        session.call_tool("echo", arguments={"message": "Hello, MCP!"})
     )
+    print_items("tools", tools)
+    print_items("resources", resources)
+    print_items("prompts", prompts)
+    print(f"\nEcho result: {echo_result}")
+    
+    # Send the sample documents to the server in a single bulk call
+    await add_documents_bulk(session, [
+        (
+            "Thinklytics is a blog series for strategic thinking and decisions making via data analytics.",
+            {"source": "documentation", "topic": "Blog Series"}
+        ),
+        (
+            "MCP (Model Context Protocol) is a protocol that allows AI models to interact with external tools and data sources.",
+            {"source": "documentation", "topic": "MCP"}
+        ),
+        (
+            "RAG (Retrieval-Augmented Generation) is a technique that combines the generative capabilities of large language models with information retrieval systems.",
+            {"source": "documentation", "topic": "RAG"}
+        )
+    ])
     
     # List documents
     try:
-        docs_result = await session.call_tool("list_documents")
+        docs_result = await cached_call(session, "list_documents")
         
         # Parse response
         documents = parse_response(docs_result, Document)
@@ -274,16 +590,18 @@ async def run_client_operations(session: ClientSession):
         elif not isinstance(documents, list):
             documents = [documents]
         
-        print("\nDocuments in knowledge base:")
+        # Build the listing first and write it out in one go
+        lines = ["", "Documents in knowledge base:"]
         if not documents:
-            print("  No documents found")
+            lines.append("  No documents found")
         else:
             for doc in documents:
-                print(f"- {doc.id}: {doc.preview}")
+                lines.append(f"- {doc.id}: {doc.preview}")
                 if doc.metadata:
-                    meta_str = ", ".join([f"{k}: {v}" for k, v in doc.metadata.model_dump(exclude_none=True, exclude_defaults=True).items() if v])
+                    meta_str = _meta_kv(doc.metadata)
                     if meta_str:
-                        print(f"  Metadata: {meta_str}")
+                        lines.append(f"  Metadata: {meta_str}")
+        sys.stdout.write("\n".join(lines) + "\n")
     except Exception as e:
         print(f"\n❌ Error listing documents: {e}")
         print("  Continuing with other operations...")
@@ -294,7 +612,8 @@ async def run_client_operations(session: ClientSession):
         search_req = SearchRequest(query="What is MCP?", top_k=1)
         
         # Call the search tool
-        search_result = await session.call_tool(
+        search_result = await cached_call(
+            session,
             "rag_search", 
             arguments=search_req.model_dump()
         )
@@ -304,49 +623,52 @@ async def run_client_operations(session: ClientSession):
         if not isinstance(results, list):
             results = [results] if results else []
         
-        print("\nSearch results for 'What is MCP?':")
+        lines = ["", "Search results for 'What is MCP?':"]
         if not results:
-            print("  No results found")
+            lines.append("  No results found")
         else:
             for item in results:
-                print(f"- Document: {item.document}")
-                print(f"  Score: {item.score}")
+                lines.append(f"- Document: {item.document}")
+                lines.append(f"  Score: {item.score}")
                 if item.metadata:
-                    meta_str = ", ".join([f"{k}: {v}" for k, v in item.metadata.model_dump(exclude_none=True, exclude_defaults=True).items() if v])
+                    meta_str = _meta_kv(item.metadata)
                     if meta_str:
-                        print(f"  Metadata: {meta_str}")
+                        lines.append(f"  Metadata: {meta_str}")
+        sys.stdout.write("\n".join(lines) + "\n")
     except Exception as e:
         print(f"\n❌ Error searching documents: {e}")
         print("  Continuing with other operations...")
     
     # Read a resource
     try:
-        sample_data, mime_type = await session.read_resource("sample://data")
+        sample_data, mime_type, truncated = await read_resource_prefix(session, "sample://data")
         print(f"\nSample data resource (mime type: {mime_type}):")
         if sample_data:
-            print(f"{sample_data[:200]}..." if len(sample_data) > 200 else sample_data)
+            print(f"{sample_data}..." if truncated else sample_data)
         else:
             print("  No content available")
     except Exception as e:
         print(f"\n❌ Error reading resource: {e}")
 
 
+# Command line parser, built once at import
+_PARSER = argparse.ArgumentParser(description="MCP Client Example")
+
+# Connection mode selection
+_mode_group = _PARSER.add_mutually_exclusive_group(required=True)
+_mode_group.add_argument("--sse", metavar="URL", help="Connect to MCP server via SSE at the specified URL")
+_mode_group.add_argument("--stdio", action="store_true", help="Connect to MCP server via stdio")
+
+# Additional parameters
+_PARSER.add_argument("--command", help="Command to run MCP server (for stdio mode)", default="npx")
+_PARSER.add_argument("--args", help="Arguments for the stdio command (can use quoted strings for arguments with spaces)", default="")
+_PARSER.add_argument("--debug", action="store_true", help="Enable debug mode with more verbose output")
+
+
 async def main():
     """Main client function that handles both SSE and stdio modes."""
     # Parse command line arguments
-    parser = argparse.ArgumentParser(description="MCP Client Example")
-    
-    # Connection mode selection
-    mode_group = parser.add_mutually_exclusive_group(required=True)
-    mode_group.add_argument("--sse", metavar="URL", help="Connect to MCP server via SSE at the specified URL")
-    mode_group.add_argument("--stdio", action="store_true", help="Connect to MCP server via stdio")
-    
-    # Additional parameters
-    parser.add_argument("--command", help="Command to run MCP server (for stdio mode)", default="npx")
-    parser.add_argument("--args", help="Arguments for the stdio command (can use quoted strings for arguments with spaces)", default="")
-    parser.add_argument("--debug", action="store_true", help="Enable debug mode with more verbose output")
-    
-    args = parser.parse_args()
+    args = _PARSER.parse_args()
     
     # Enable debug mode if requested
     if args.debug:
@@ -375,5 +697,14 @@ async def main():
 
 
 if __name__ == "__main__":
+    # Use the libuv-based event loop where it is available
+    try:
+        import uvloop
+    except ImportError:
+        uvloop = None
+    
     # Run the main function
-    asyncio.run(main())
+    if uvloop is not None:
+        uvloop.run(main())
+    else:
+        asyncio.run(main())
@@ -4,7 +4,7 @@ Shared Data Models for MCP Server and Client
 This module defines Pydantic models for data exchange between the MCP server and client.
 """
 
-from pydantic import BaseModel, Field, model_validator
+from pydantic import BaseModel, Field, TypeAdapter
 from typing import Dict, List, Optional, Union, Any
 from enum import Enum
 
@@ -14,41 +14,22 @@ class DocumentMetadata(BaseModel):
     source: Optional[str] = None
     topic: Optional[str] = None
     created_at: Optional[str] = None
-    # Allow for additional fields
-    extra_fields: Dict[str, Any] = Field(default_factory=dict)
     
     model_config = {
-        # Allow extra fields to be stored in the model
-        "extra": "allow"
+        # Unknown fields are kept by pydantic-core and exposed via model_extra
+        "extra": "allow",
+        # Read-only data carrier
+        "frozen": True
     }
 
-    @model_validator(mode='before')
-    @classmethod
-    def extract_extra_fields(cls, data):
-        """Extract unknown fields to extra_fields dictionary"""
-        if not isinstance(data, dict):
-            return data
-            
-        known_fields = {"source", "topic", "created_at", "extra_fields"}
-        extra_fields = {}
-        
-        # Extract unknown fields to extra_fields
-        for field_name, value in list(data.items()):
-            if field_name not in known_fields and value is not None:
-                extra_fields[field_name] = value
-                
-        # Update values with extracted extra fields
-        if extra_fields:
-            data["extra_fields"] = extra_fields
-            
-        return data
-
 
 class Document(BaseModel):
     """A document in the knowledge base"""
     id: str
     preview: str
     metadata: Optional[DocumentMetadata] = Field(default_factory=DocumentMetadata)
+    
+    model_config = {"frozen": True}
 
 
 class SearchResult(BaseModel):
@@ -56,6 +37,8 @@ class SearchResult(BaseModel):
     document: str
     metadata: Optional[DocumentMetadata] = Field(default_factory=DocumentMetadata)
     score: float = 0.0
+    
+    model_config = {"frozen": True}
 
 
 class DocumentStatus(str, Enum):
@@ -69,16 +52,6 @@ class AddDocumentRequest(BaseModel):
     """Request to add a document to the knowledge base"""
     content: str
     metadata: Optional[DocumentMetadata] = None
-    
-    @model_validator(mode='before')
-    @classmethod
-    def sanitize_metadata(cls, data):
-        """Remove None values from metadata"""
-        if isinstance(data, dict) and "metadata" in data and data["metadata"] is not None:
-            if isinstance(data["metadata"], dict):
-                # Remove None values from metadata
-                data["metadata"] = {k: v for k, v in data["metadata"].items() if v is not None}
-        return data
 
 
 class AddDocumentResponse(BaseModel):
@@ -91,4 +64,30 @@ class AddDocumentResponse(BaseModel):
 class SearchRequest(BaseModel):
     """Request to search the knowledge base"""
     query: str
-    top_k: int = 3 
\ No newline at end of file
+    top_k: int = 3
+
+
+# Validators for the models returned by the server's tools, built once at import
+_ADAPTERS = {
+    model: (TypeAdapter(model), TypeAdapter(List[model]))
+    for model in (Document, SearchResult, AddDocumentResponse)
+}
+
+
+def parse_model(model_class, text: str):
+    """Validate a JSON tool payload into model_class.
+
+    Args:
+        model_class: Pydantic model class to parse into
+        text: JSON text holding a single object or an array of objects
+
+    Returns:
+        A model instance, or a list of instances for array payloads
+    """
+    adapters = _ADAPTERS.get(model_class)
+    if adapters is None:
+        adapters = _ADAPTERS[model_class] = (TypeAdapter(model_class), TypeAdapter(List[model_class]))
+    single, many = adapters
+    if text.lstrip().startswith('['):
+        return many.validate_json(text)
+    return single.validate_json(text)
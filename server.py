@@ -71,14 +71,17 @@ def setup_mcp():
     # Sample data resource for quick access
     sample_file_path = os.path.join(os.path.dirname(__file__), "sample_data.txt")
 
+    # The file is static, so read it once at startup and serve it from memory
+    try:
+        with open(sample_file_path, "r") as f:
+            sample_data = f.read()
+    except FileNotFoundError:
+        sample_data = "Sample data file not found"
+
     @mcp.resource("sample://data")
     def get_sample_data() -> str:
         """Retrieve sample data as a resource"""
-        try:
-            with open(sample_file_path, "r") as f:
-                return f.read()
-        except FileNotFoundError:
-            return "Sample data file not found"
+        return sample_data
 
     print("✅ Resources registered")
     
@@ -129,8 +132,10 @@ try:
             print("\nPress Ctrl+C to exit")
             
             try:
-                # Run the server directly using uvicorn
-                uvicorn.run(app, host=args.host, port=args.port)
+                # Run the server directly using uvicorn. With uvicorn[standard] installed, the
+                # default "auto" loop and http settings pick uvloop and httptools; the
+                # per-request access log is kept quiet to stay off the SSE hot path.
+                uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
             except KeyboardInterrupt:
                 print("\n👋 Server shutdown requested via Ctrl+C")
                 sys.exit(0)
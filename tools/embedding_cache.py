@@ -0,0 +1,138 @@
+"""
+Persistent Embedding Cache
+
+This module provides an on-disk cache of text embeddings backed by SQLite, so embeddings
+survive server restarts and are shared by every process using the same cache file.
+Recently used embeddings are also kept in memory to skip the SQLite lookup.
+"""
+
+import hashlib
+import sqlite3
+import threading
+import numpy as np
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+
+class EmbeddingCache:
+    """Cache float32 embeddings in SQLite, keyed by the SHA-256 digest of the model name and text.
+
+    Once more than `max_entries` embeddings are stored, the oldest ones are dropped.
+    The `memory_entries` most recently used embeddings are also held in an in-process
+    LRU under the same digest. Returned arrays are read-only. `model_name` should identify
+    the exact encoder (model plus backend and precision), so that several encoders can share
+    one cache file without mixing up their vectors.
+    """
+
+    def __init__(self, path, model_name: str = "", max_entries: int = 100_000, memory_entries: int = 4096):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self._memory = OrderedDict()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key BLOB PRIMARY KEY, vector BLOB NOT NULL)")
+        self._conn.commit()
+        self._count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def _key(self, text: str) -> bytes:
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode("utf-8")).digest()
+
+    def _remember(self, key: bytes, embedding: np.ndarray) -> None:
+        """Add an embedding to the in-memory LRU; the caller must hold the lock."""
+        if self.memory_entries <= 0:
+            return
+        self._memory[key] = embedding
+        self._memory.move_to_end(key)
+        if len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _lookup(self, key: bytes) -> Optional[np.ndarray]:
+        """Find an embedding in memory or on disk; the caller must hold the lock."""
+        embedding = self._memory.get(key)
+        if embedding is not None:
+            self._memory.move_to_end(key)
+            self._stats["memory_hits"] += 1
+            return embedding
+
+        row = self._conn.execute("SELECT vector FROM embeddings WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self._stats["misses"] += 1
+            return None
+        self._stats["disk_hits"] += 1
+        embedding = np.frombuffer(row[0], dtype=np.float32)
+        self._remember(key, embedding)
+        return embedding
+
+    def _store(self, key: bytes, embedding) -> np.ndarray:
+        """Insert an embedding without committing; the caller must hold the lock."""
+        embedding = np.array(embedding, dtype=np.float32)
+        embedding.setflags(write=False)
+        self._remember(key, embedding)
+        cursor = self._conn.execute(
+            "INSERT OR IGNORE INTO embeddings (key, vector) VALUES (?, ?)",
+            (key, embedding.tobytes())
+        )
+        self._count += cursor.rowcount
+        return embedding
+
+    def _commit(self) -> None:
+        """Evict the oldest entries if over the limit and commit; the caller must hold the lock."""
+        if self._count > self.max_entries:
+            # Trim back to 90% of the limit so eviction doesn't run on every insert
+            excess = self._count - int(self.max_entries * 0.9)
+            self._conn.execute(
+                "DELETE FROM embeddings WHERE rowid IN (SELECT rowid FROM embeddings ORDER BY rowid LIMIT ?)",
+                (excess,)
+            )
+            self._count -= excess
+        self._conn.commit()
+
+    def get(self, text: str) -> Optional[np.ndarray]:
+        """Return the cached embedding for the text, or None if it isn't cached."""
+        key = self._key(text)
+        with self._lock:
+            return self._lookup(key)
+
+    def put(self, text: str, embedding) -> np.ndarray:
+        """Store the embedding for the text and return the stored read-only copy."""
+        key = self._key(text)
+        with self._lock:
+            embedding = self._store(key, embedding)
+            self._commit()
+        return embedding
+
+    def get_or_compute(self, text: str, compute: Callable[[str], np.ndarray]) -> np.ndarray:
+        """Return the cached embedding for the text, computing and storing it on a miss."""
+        embedding = self.get(text)
+        if embedding is None:
+            embedding = self.put(text, compute(text))
+        return embedding
+
+    def get_or_compute_many(self, texts: List[str], compute: Callable[[List[str]], np.ndarray]) -> List[np.ndarray]:
+        """Return embeddings for several texts, computing all the misses with one call.
+
+        `compute` receives the distinct uncached texts and must return one embedding per
+        text, in order. New embeddings are written in a single transaction.
+        """
+        keys = [self._key(text) for text in texts]
+        with self._lock:
+            found = {key: self._lookup(key) for key in dict.fromkeys(keys)}
+        misses = {key: text for key, text in zip(keys, texts) if found[key] is None}
+
+        if misses:
+            computed = compute(list(misses.values()))
+            with self._lock:
+                for key, embedding in zip(misses, computed):
+                    found[key] = self._store(key, embedding)
+                self._commit()
+        return [found[key] for key in keys]
+
+    def info(self) -> Dict[str, int]:
+        """Report hit/miss counts and the size of the in-memory LRU."""
+        with self._lock:
+            return {**self._stats, "memory_size": len(self._memory), "memory_maxsize": self.memory_entries}
@@ -0,0 +1,84 @@
+"""
+Lexical Scorer for the In-Memory Backend
+
+This module scores documents by how many of the query's terms they contain, for when no
+embedding model is available. With Numba installed, the scan runs as a compiled parallel
+kernel over a single byte buffer holding every document.
+"""
+
+import numpy as np
+
+try:
+    from numba import njit, prange
+except ImportError:
+    njit = None
+
+
+if njit is not None:
+    @njit(parallel=True, cache=True)
+    def _score_all(buffer, offsets, terms, term_offsets):
+        """Return, per document, the fraction of terms occurring in it as a substring."""
+        n_docs = len(offsets) - 1
+        n_terms = len(term_offsets) - 1
+        scores = np.zeros(n_docs, dtype=np.float64)
+        for d in prange(n_docs):
+            found = 0
+            for t in range(n_terms):
+                t_start = term_offsets[t]
+                t_len = term_offsets[t + 1] - t_start
+                for i in range(offsets[d], offsets[d + 1] - t_len + 1):
+                    match = True
+                    for j in range(t_len):
+                        if buffer[i + j] != terms[t_start + j]:
+                            match = False
+                            break
+                    if match:
+                        found += 1
+                        break
+            scores[d] = found / n_terms
+        return scores
+else:
+    _score_all = None
+
+
+def _pack(chunks):
+    """Concatenate byte strings into one uint8 buffer plus start offsets (with a final end offset)."""
+    offsets = np.zeros(len(chunks) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(chunk) for chunk in chunks])
+    return np.frombuffer(b"".join(chunks), dtype=np.uint8), offsets
+
+
+class LexicalScorer:
+    """Score documents by the fraction of query terms each one contains, ignoring case.
+
+    Scores are returned in the order documents were added. Matching is done on UTF-8
+    bytes, which gives the same result as substring tests on the lowercased text.
+    """
+
+    def __init__(self):
+        self._texts = []
+        self._buffer = None
+        self._offsets = None
+
+    def add(self, content: str) -> None:
+        """Index a document's content."""
+        self._texts.append(content.lower())
+        self._buffer = None
+
+    def score(self, query: str) -> np.ndarray:
+        """Return one score in [0, 1] per indexed document."""
+        terms = query.lower().split()
+        if not terms or not self._texts:
+            return np.zeros(len(self._texts))
+
+        if _score_all is None:
+            return np.array([sum(1 for term in terms if term in text) / len(terms) for text in self._texts])
+
+        # Pack the documents once per change, not once per query
+        if self._buffer is None:
+            self._buffer, self._offsets = _pack([text.encode("utf-8") for text in self._texts])
+        term_buffer, term_offsets = _pack([term.encode("utf-8") for term in terms])
+        return _score_all(self._buffer, self._offsets, term_buffer, term_offsets)
+
+    def __len__(self) -> int:
+        return len(self._texts)
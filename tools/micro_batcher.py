@@ -0,0 +1,69 @@
+"""
+Micro-Batcher for Tool Calls
+
+This module coalesces concurrent single-item requests into batches, so work that is
+cheaper in bulk (embedding, database writes) runs once per batch instead of once per item.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, List
+
+
+class MicroBatcher:
+    """Collect submitted items and process them together.
+
+    A batch is processed once `max_batch_size` items are pending or `max_delay`
+    seconds after its first item arrived, whichever comes first. `process` is a
+    coroutine function that receives the list of items and must return one result
+    per item, in the same order.
+    """
+
+    def __init__(self, process: Callable[[List[Any]], Awaitable[List[Any]]], max_batch_size: int = 32, max_delay: float = 0.05):
+        self.process = process
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self._pending = []
+        self._timer = None
+        self._tasks = set()
+
+    async def submit(self, item: Any) -> Any:
+        """Queue an item and wait for its result."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future))
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_delay, self._flush)
+
+        return await future
+
+    def _flush(self) -> None:
+        """Start processing everything pending."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+
+        # Keep a reference so the task isn't garbage collected while it runs
+        task = asyncio.get_running_loop().create_task(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch) -> None:
+        """Process a batch and resolve the waiting callers."""
+        try:
+            results = await self.process([item for item, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
@@ -0,0 +1,91 @@
+"""
+Proximity Cache for RAG Search
+
+This module provides an approximate cache for search results keyed on query embeddings,
+so differently phrased but semantically equivalent queries can reuse earlier results.
+"""
+
+import time
+import numpy as np
+from typing import Any, Optional
+
+
+class ProximityCache:
+    """Cache search results by query embedding similarity.
+
+    A lookup returns the value stored for the most similar cached query when their
+    cosine similarity is at least `tau`. Once `capacity` entries are stored, the
+    least recently used one is evicted. With a `ttl` (in seconds), entries older than
+    that are never returned, which bounds how stale a result can be when the store is
+    also written by other processes.
+
+    Embeddings must be unit length (e.g. encoded with normalize_embeddings=True),
+    so a dot product gives the cosine similarity directly.
+
+    `generation` is incremented by every `clear()`, so a caller that computed a value
+    while the cache was being cleared can tell that the value may be stale.
+    """
+
+    def __init__(self, capacity: int = 256, tau: float = 0.97, ttl: Optional[float] = None):
+        self.capacity = capacity
+        self.tau = tau
+        self.ttl = ttl
+        self._keys = None
+        self._values = []
+        self._last_used = np.zeros(max(capacity, 0), dtype=np.int64)
+        self._stored_at = np.zeros(max(capacity, 0), dtype=np.float64)
+        self._clock = 0
+        self.generation = 0
+
+    def get(self, embedding) -> Optional[Any]:
+        """Return the cached value for the closest stored query, or None on a miss."""
+        size = len(self._values)
+        if not size:
+            return None
+
+        # One matrix-vector product scores the query against every cached key
+        similarities = np.dot(self._keys[:size], np.asarray(embedding, dtype=np.float32))
+        if self.ttl:
+            # Expired entries can't match, and become the first candidates for eviction
+            expired = time.monotonic() - self._stored_at[:size] > self.ttl
+            similarities[expired] = -np.inf
+            self._last_used[:size][expired] = 0
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.tau:
+            return None
+
+        self._clock += 1
+        self._last_used[best] = self._clock
+        return self._values[best]
+
+    def put(self, embedding, value: Any) -> None:
+        """Store a value for the query embedding, evicting the least recently used entry if full."""
+        if self.capacity <= 0:
+            return
+        key = np.asarray(embedding, dtype=np.float32)
+        if self._keys is None:
+            # Allocate the key matrix once, sized from the first embedding
+            self._keys = np.empty((self.capacity, key.shape[-1]), dtype=np.float32)
+
+        size = len(self._values)
+        if size < self.capacity:
+            slot = size
+            self._values.append(value)
+        else:
+            # Overwrite the least recently used slot in place
+            slot = int(np.argmin(self._last_used))
+            self._values[slot] = value
+
+        self._keys[slot] = key
+        self._stored_at[slot] = time.monotonic()
+        self._clock += 1
+        self._last_used[slot] = self._clock
+
+    def clear(self) -> None:
+        """Drop all cached entries, e.g. after the knowledge base changes."""
+        self._values = []
+        self._last_used[:] = 0
+        self.generation += 1
+
+    def __len__(self) -> int:
+        return len(self._values)
@@ -5,17 +5,28 @@ This module provides retrieval-augmented generation (RAG) capabilities for the M
 """
 
 from mcp.server.fastmcp import FastMCP
-from sentence_transformers import SentenceTransformer
+from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+import torch
+import numpy as np
 import chromadb
-from chromadb.errors import InternalError
 import os
 import json
+import asyncio
+import hashlib
+import uuid
 import logging
 from datetime import datetime
+from functools import lru_cache
 from typing import List, Dict, Any
 import dotenv
 from pathlib import Path
 
+# SimSIMD's hand-written SIMD kernels score the in-memory backend when installed
+try:
+    import simsimd
+except ImportError:
+    simsimd = None
+
 # Import the shared models
 from models import (
     Document, 
@@ -27,6 +38,11 @@ from models import (
     DocumentStatus
 )
 
+from tools.proximity_cache import ProximityCache
+from tools.embedding_cache import EmbeddingCache
+from tools.micro_batcher import MicroBatcher
+from tools.lexical_scorer import LexicalScorer
+
 # Load environment variables
 dotenv.load_dotenv()
 
@@ -37,17 +53,226 @@ logging.basicConfig(
 )
 log = logging.getLogger(__name__)
 
+# Number of documents fetched from ChromaDB per request when walking the whole collection
+PAGE_SIZE = 256
+
+# Rows preallocated for the in-memory embedding matrix; it doubles whenever it fills up
+IN_MEMORY_INITIAL_CAPACITY = 1024
+
+# Metadata keys derived from each document's content: a digest used for duplicate
+# detection, and the preview list_documents returns without fetching the full text.
+# Internal keys like these are stored with the document but never returned in its metadata.
+CONTENT_HASH_KEY = "content_hash"
+PREVIEW_KEY = "doc_preview"
+INTERNAL_METADATA_KEYS = frozenset({CONTENT_HASH_KEY, PREVIEW_KEY})
+
+# Collection metadata marker recording that every document carries the internal keys,
+# so the backfill scan runs once per collection rather than on every startup
+INTERNAL_METADATA_VERSION_KEY = "internal_metadata_version"
+INTERNAL_METADATA_VERSION = 1
+
+def content_hash(content: str) -> str:
+    """Return a hex digest identifying the document content"""
+    return hashlib.blake2b(content.encode("utf-8"), digest_size=16).hexdigest()
+
+def make_preview(content: str) -> str:
+    """Return the first 100 characters of the content, marking truncation"""
+    return content[:100] + "..." if len(content) > 100 else content
+
+def new_document_id() -> str:
+    """Generate an ID for a new document"""
+    return f"doc_{uuid.uuid4().hex}"
+
+def quantize_int8(vector: np.ndarray) -> tuple:
+    """Quantize a vector to int8 codes and a scale, such that vector ≈ codes * scale"""
+    scale = float(np.max(np.abs(vector))) / 127 or 1.0
+    return np.round(vector / scale).astype(np.int8), scale
+
+def public_metadata(metadata: Dict[str, Any]) -> Dict[str, Any]:
+    """Drop internal bookkeeping keys from stored metadata"""
+    return {k: v for k, v in metadata.items() if k not in INTERNAL_METADATA_KEYS}
+
+def fill_internal_metadata(collection, ids: List[str]) -> Dict[str, str]:
+    """Compute and store the content hash and preview of the given documents.
+    
+    Returns the new previews keyed by document ID.
+    """
+    previews = {}
+    for start in range(0, len(ids), PAGE_SIZE):
+        docs = collection.get(ids=ids[start:start + PAGE_SIZE], include=["documents"])
+        page_previews = [make_preview(doc or "") for doc in docs["documents"]]
+        collection.update(
+            ids=docs["ids"],
+            metadatas=[
+                {CONTENT_HASH_KEY: content_hash(doc or ""), PREVIEW_KEY: preview}
+                for doc, preview in zip(docs["documents"], page_previews)
+            ]
+        )
+        previews.update(zip(docs["ids"], page_previews))
+    return previews
+
+def backfill_internal_metadata(collection) -> int:
+    """Add content hashes and previews to documents stored before they were recorded.
+    
+    Skipped once the collection is marked as migrated. Returns the number of documents updated.
+    """
+    collection_metadata = collection.metadata or {}
+    if collection_metadata.get(INTERNAL_METADATA_VERSION_KEY, 0) >= INTERNAL_METADATA_VERSION:
+        return 0
+    
+    missing = []
+    offset = 0
+    while True:
+        page = collection.get(limit=PAGE_SIZE, offset=offset, include=["metadatas"])
+        if not page or not page["ids"]:
+            break
+        for doc_id, metadata in zip(page["ids"], page["metadatas"] or [None] * len(page["ids"])):
+            if not metadata or not INTERNAL_METADATA_KEYS <= metadata.keys():
+                missing.append(doc_id)
+        offset += len(page["ids"])
+    
+    fill_internal_metadata(collection, missing)
+    
+    # modify() replaces the metadata; the hnsw:* entries are dropped because Chroma rejects
+    # them there once the collection exists, and it keeps the index settings separately
+    collection.modify(metadata={
+        **{k: v for k, v in collection_metadata.items() if not k.startswith("hnsw:")},
+        INTERNAL_METADATA_VERSION_KEY: INTERNAL_METADATA_VERSION,
+    })
+    return len(missing)
+
+# HNSW index settings for newly created collections. Embeddings are normalized at encode
+# time, so inner product ranks exactly like cosine without computing norms per distance.
+# The search ef (candidates examined per query) trades latency for recall and is the one
+# setting that can still be changed once a collection exists.
+HNSW_SEARCH_EF = int(os.getenv("HNSW_SEARCH_EF", "64"))
+HNSW_METADATA = {
+    "hnsw:space": "ip",
+    "hnsw:M": 32,
+    "hnsw:construction_ef": 200,
+    "hnsw:search_ef": HNSW_SEARCH_EF,
+}
+
+def apply_search_ef(collection) -> None:
+    """Bring an existing collection's HNSW search ef in line with HNSW_SEARCH_EF"""
+    try:
+        hnsw = (collection.configuration or {}).get("hnsw")
+        if hnsw and hnsw.get("ef_search") != HNSW_SEARCH_EF:
+            collection.modify(configuration={"hnsw": {"ef_search": HNSW_SEARCH_EF}})
+            log.info(f"Set HNSW search ef to {HNSW_SEARCH_EF} (was {hnsw.get('ef_search')})")
+    except (AttributeError, TypeError) as e:
+        # Collection configurations are a ChromaDB 1.x API; older versions keep their settings
+        log.info(f"Can't update HNSW search ef with this ChromaDB version ({e}), skipping")
+
+# Cap intra-op threads so several server processes on one host don't oversubscribe the CPU
+torch.set_num_threads(max(1, (os.cpu_count() or 2) // 2))
+
+# Project root directory, used for default on-disk locations
+PROJECT_ROOT = Path(os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+
+EMBEDDING_MODEL = 'all-MiniLM-L6-v2'
+
+# Dynamically quantized int8 ONNX export, using AVX-512 VNNI int8 dot products where available
+ONNX_QINT8_FILE = "onnx/model_qint8_avx512_vnni.onnx"
+
+def load_onnx_model(model_name: str) -> SentenceTransformer:
+    """Load the int8 ONNX export of a model, quantizing one locally if the model doesn't ship it"""
+    try:
+        return SentenceTransformer(model_name, backend="onnx", model_kwargs={"file_name": ONNX_QINT8_FILE})
+    except Exception as e:
+        log.info(f"No {ONNX_QINT8_FILE} available for {model_name} ({e}), exporting one")
+    
+    # Export once and reuse the local copy on later starts
+    export_dir = os.path.join(os.getenv("ONNX_EXPORT_DIR", os.path.join(PROJECT_ROOT, "onnx_models")), model_name)
+    if not os.path.exists(os.path.join(export_dir, ONNX_QINT8_FILE)):
+        model = SentenceTransformer(model_name, backend="onnx")
+        model.save(export_dir)
+        export_dynamic_quantized_onnx_model(model, "avx512_vnni", export_dir)
+    return SentenceTransformer(export_dir, backend="onnx", model_kwargs={"file_name": ONNX_QINT8_FILE})
+
+# NNCF-quantized int8 OpenVINO export, often the fastest option on Intel CPUs
+OPENVINO_QINT8_FILE = "openvino/openvino_model_qint8_quantized.xml"
+
+def load_openvino_model(model_name: str) -> SentenceTransformer:
+    """Load the int8 OpenVINO export of a model, or its FP32 OpenVINO export if it doesn't ship one"""
+    try:
+        return SentenceTransformer(model_name, backend="openvino", model_kwargs={"file_name": OPENVINO_QINT8_FILE})
+    except Exception as e:
+        # Static quantization needs a calibration dataset, so don't attempt it at startup
+        log.info(f"No {OPENVINO_QINT8_FILE} available for {model_name} ({e}), using FP32 OpenVINO")
+        model = SentenceTransformer(model_name, backend="openvino")
+        model.encoder_id = f"{model_name}|openvino|fp32"
+        return model
+
+# Loaders for the accelerated backends selectable with RAG_BACKEND
+MODEL_LOADERS = {
+    "onnx": load_onnx_model,
+    "openvino": load_openvino_model,
+}
+
+@lru_cache(maxsize=None)
+def load_model(model_name: str, backend: str, device: str, quantize: bool) -> SentenceTransformer:
+    """Load a model once per process for each configuration, so all callers share its weights.
+    
+    The returned model's `encoder_id` names the variant actually loaded (after any fallback),
+    since each variant produces slightly different vectors for the same text.
+    """
+    if backend in MODEL_LOADERS:
+        try:
+            model = MODEL_LOADERS[backend](model_name)
+            if not hasattr(model, "encoder_id"):
+                model.encoder_id = f"{model_name}|{backend}|int8"
+            print(f"✅ Using {model.encoder_id.rsplit('|', 1)[1]} {backend} embedding model")
+            return model
+        except Exception as e:
+            print(f"⚠️ {backend} backend unavailable ({str(e)}), falling back to PyTorch")
+    
+    model = SentenceTransformer(model_name, device=device)
+    
+    if device == "cuda":
+        # FP16 halves memory traffic and runs on the GPU's tensor cores
+        model.half()
+        print("✅ Embedding model running in FP16 on CUDA")
+    elif quantize:
+        # Swap the transformer's Linear layers for int8 dynamically quantized ones,
+        # which speeds up CPU encoding at a negligible cost in retrieval quality
+        torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+        print("✅ Embedding model quantized to int8")
+    
+    precision = "fp16" if device == "cuda" else "int8" if quantize else "fp32"
+    model.encoder_id = f"{model_name}|torch|{device}|{precision}"
+    return model
+
+def get_embedding_model() -> SentenceTransformer:
+    """Return the configured embedding model, shared by both tool backends"""
+    # On a GPU host PyTorch runs the encoder on the GPU; on CPU, ONNX Runtime or
+    # OpenVINO with int8 weights are considerably faster than FP32 PyTorch
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    backend = os.getenv("RAG_BACKEND", "torch" if device == "cuda" else "onnx")
+    return load_model(EMBEDDING_MODEL, backend, device, os.getenv("RAG_QUANTIZE", "0") == "1")
+
+@lru_cache(maxsize=None)
+def get_chroma_client(path: str):
+    """Open the ChromaDB client once per process.
+    
+    When CHROMA_HOST is set, connect to that Chroma server, which several server
+    processes can share safely; otherwise open the local persistent store at `path`.
+    """
+    chroma_host = os.getenv("CHROMA_HOST")
+    if chroma_host:
+        chroma_port = int(os.getenv("CHROMA_PORT", "8000"))
+        log.info(f"Using ChromaDB server: {chroma_host}:{chroma_port}")
+        return chromadb.HttpClient(host=chroma_host, port=chroma_port)
+    return chromadb.PersistentClient(path=path)
+
 def register_rag_tools(mcp_instance: FastMCP):
     """Register RAG-related tools with the MCP server"""
     
     # Initialize components
-    model = SentenceTransformer('all-MiniLM-L6-v2')
-    
-    # Get project root directory
-    project_root = Path(os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+    model = get_embedding_model()
     
     # Get ChromaDB path from environment variable or use default (project root + chroma_db)
-    default_path = os.path.join(project_root, "chroma_db")
+    default_path = os.path.join(PROJECT_ROOT, "chroma_db")
     chroma_db_path = os.getenv("CHROMA_DB_PATH", default_path)
     log.info(f"Using ChromaDB path: {chroma_db_path}")
     
@@ -56,44 +281,76 @@ def register_rag_tools(mcp_instance: FastMCP):
     
     try:
         # Initialize the ChromaDB client
-        chroma_client = chromadb.PersistentClient(path=chroma_db_path)
-        
-        # Check if collection exists - compatible with v0.6.0+
-        collection_names = chroma_client.list_collections()
-        print(f"Collection names: {collection_names}")
-        
-        # Handle different versions of ChromaDB API
-        collection_exists = False
-        if collection_names:
-            if isinstance(collection_names[0], str):
-                # ChromaDB v0.6.0+ returns strings
-                collection_exists = "documents" in collection_names
-            else:
-                # Older versions return objects with name attribute
-                collection_exists = any(getattr(col, 'name', None) == "documents" for col in collection_names)
+        chroma_client = get_chroma_client(chroma_db_path)
         
-        print(f"Collection exists: {collection_exists}")
-        if collection_exists:
-            collection = chroma_client.get_collection("documents")
-            print("✅ Using existing ChromaDB collection: 'documents'")
-        else:
-            collection = chroma_client.create_collection("documents")
-            print("✅ Created new ChromaDB collection: 'documents'")
+        # Similarity-based distance suits the SBERT embeddings better than Chroma's default L2, and
+        # the HNSW parameters trade a slower build for better recall per candidate at query time.
+        # An existing collection keeps the parameters it was created with, except the search ef.
+        collection = chroma_client.get_or_create_collection("documents", metadata=HNSW_METADATA)
+        apply_search_ef(collection)
+        print("✅ Using ChromaDB collection: 'documents'")
     except Exception as e:
         print(f"❌ Error initializing ChromaDB: {str(e)}")
         raise
     
+    # Persistent embedding cache shared across restarts (and by every process using the same file),
+    # fronted by an in-memory LRU so repeated queries and re-added documents skip the forward pass.
+    # Entries are keyed by the encoder variant (model, backend, device and precision) as well as
+    # the text, so changing RAG_BACKEND, RAG_QUANTIZE or the device never reuses another variant's vectors.
+    embedding_cache_path = os.getenv("EMBEDDING_CACHE_PATH", os.path.join(PROJECT_ROOT, "embedding_cache.sqlite3"))
+    embedding_cache = EmbeddingCache(
+        embedding_cache_path,
+        model_name=model.encoder_id,
+        memory_entries=int(os.getenv("EMBEDDING_MEMORY_CACHE_SIZE", "4096"))
+    )
+    log.info(f"Using embedding cache: {embedding_cache_path}")
+    
+    # Documents added by older versions lack the content hash and preview
+    backfilled = backfill_internal_metadata(collection)
+    if backfilled:
+        print(f"✅ Added content hashes and previews to {backfilled} existing documents")
+    
+    def embed(text):
+        """Embed text (or a list of texts) as unit-length float32 NumPy arrays"""
+        return np.asarray(
+            model.encode(text, batch_size=32, convert_to_numpy=True, normalize_embeddings=True),
+            dtype=np.float32
+        )
+    
+    # Approximate cache of search results keyed on query embeddings, so rephrased
+    # queries close enough to an earlier one skip the ChromaDB query entirely. Writes
+    # by this process clear it; entries also expire, so documents added by other
+    # processes sharing the store show up within PROXIMITY_TTL seconds.
+    search_cache = ProximityCache(
+        capacity=int(os.getenv("PROXIMITY_CACHE_SIZE", "256")),
+        tau=float(os.getenv("PROXIMITY_TAU", "0.97")),
+        ttl=float(os.getenv("PROXIMITY_TTL", "60"))
+    )
+    
+    # Encoding and Chroma calls run in worker threads (both release the GIL in their native
+    # code), so concurrent tool calls overlap instead of queueing on the event loop. The
+    # search cache is only touched from the event loop.
+    
     @mcp_instance.tool()
-    def rag_search(query: str, top_k: int = 3) -> List[SearchResult]:
+    async def rag_search(query: str, top_k: int = 3) -> List[SearchResult]:
         """Search the knowledge base for information related to the query"""
         try:
             # Embed the query
-            query_embedding = model.encode(query).tolist()
+            query_embedding = await asyncio.to_thread(embedding_cache.get_or_compute, query, embed)
+            
+            # Serve a cached result set if a near-identical query asked for at least as many results
+            cached = search_cache.get(query_embedding)
+            if cached is not None and cached[0] >= top_k:
+                return cached[1][:top_k]
             
-            # Search the collection
-            results = collection.query(
-                query_embeddings=[query_embedding],
-                n_results=top_k
+            # Search the collection, noting the cache generation so results that raced
+            # with an add aren't cached
+            generation = search_cache.generation
+            results = await asyncio.to_thread(
+                collection.query,
+                query_embeddings=query_embedding[np.newaxis, :],
+                n_results=top_k,
+                include=["documents", "metadatas", "distances"]
             )
             
             # Handle empty results
@@ -102,33 +359,25 @@ def register_rag_tools(mcp_instance: FastMCP):
                     document="No relevant documents found",
                     metadata=DocumentMetadata(),
                     score=0.0
-                ).model_dump()]
+                )]
             
-            search_results = []
-            for i in range(len(results["documents"][0])):
-                # Get document content
-                doc_content = results["documents"][0][i]
-                
-                # Get metadata safely
-                raw_metadata = results["metadatas"][0][i] if results.get("metadatas") and results["metadatas"][0] else {}
-                
-                # Create DocumentMetadata, differentiating between known fields and extra fields
-                known_fields = {"source", "topic", "created_at"}
-                extra_fields = {k: v for k, v in raw_metadata.items() if k not in known_fields}
-                metadata_dict = {k: v for k, v in raw_metadata.items() if k in known_fields}
-                metadata_dict["extra_fields"] = extra_fields
-                
-                # Get score safely
-                score = results["distances"][0][i] if results.get("distances") and results["distances"][0] else 0.0
-                
-                # Create SearchResult object
-                result = SearchResult(
+            # Look up the per-query columns once rather than for every result
+            documents = results["documents"][0]
+            metadatas = results["metadatas"][0] if results.get("metadatas") and results["metadatas"][0] else [None] * len(documents)
+            distances = results["distances"][0] if results.get("distances") and results["distances"][0] else [0.0] * len(documents)
+            
+            # Chroma's response is trusted data, so build the models without re-validating it
+            search_results = [
+                SearchResult.model_construct(
                     document=doc_content,
-                    metadata=DocumentMetadata(**metadata_dict),
+                    metadata=DocumentMetadata.model_construct(**public_metadata(raw_metadata or {})),
                     score=score
                 )
-                search_results.append(result.model_dump())
+                for doc_content, raw_metadata, score in zip(documents, metadatas, distances)
+            ]
                 
+            if search_cache.generation == generation:
+                search_cache.put(query_embedding, (top_k, search_results))
             return search_results
         except Exception as e:
             print(f"Error in rag_search: {str(e)}")
@@ -136,34 +385,124 @@ def register_rag_tools(mcp_instance: FastMCP):
                 document=f"Error searching knowledge base: {str(e)}",
                 metadata=DocumentMetadata(),
                 score=0.0
-            ).model_dump()]
+            )]
     
-    # Helper function to check for duplicate documents
-    def check_for_duplicate_document(content, collection):
-        """Check if a document with the same content already exists in the collection.
+    def store_documents(entries: List[tuple]) -> List[Dict[str, Any]]:
+        """Embed and store a batch of documents, skipping content that is already stored.
         
         Args:
-            content: The document content to check
-            collection: The ChromaDB collection
+            entries: (content, metadata) pairs; metadata is a dict without None values
             
         Returns:
-            Tuple of (exists: bool, document_id: str or None)
+            One AddDocumentResponse dict per entry, in order
         """
-        collection_data = collection.get()
+        responses = [None] * len(entries)
         
-        # Check for empty collection
-        if not collection_data or "documents" not in collection_data or not collection_data["documents"]:
-            return False, None
+        # Look up the batch's content hashes in one metadata query
+        digests = [content_hash(content) for content, _ in entries]
+        existing = {}
+        if digests:
+            collection_data = collection.get(where={CONTENT_HASH_KEY: {"$in": list(set(digests))}}, include=["metadatas"])
+            for doc_id, metadata in zip(collection_data["ids"], collection_data["metadatas"] or []):
+                existing[metadata[CONTENT_HASH_KEY]] = doc_id
+        
+        new_ids, new_contents, new_metadatas, positions = [], [], [], []
+        for i, ((content, metadata), digest) in enumerate(zip(entries, digests)):
+            # Check for duplicate content, including earlier entries of this batch
+            duplicate_id = existing.get(digest)
+            if duplicate_id is not None:
+                responses[i] = AddDocumentResponse(
+                    status=DocumentStatus.DUPLICATE,
+                    id=duplicate_id,
+                    message=f"Document with this content already exists with ID: {duplicate_id}"
+                ).model_dump()
+                continue
             
-        # Check each document for matching content
-        for i, doc_content in enumerate(collection_data["documents"]):
-            if doc_content == content:
-                return True, collection_data["ids"][i]
-                
-        return False, None
+            metadata = dict(metadata)
+            if "created_at" not in metadata:
+                metadata["created_at"] = datetime.now().isoformat()
+            metadata[CONTENT_HASH_KEY] = digest
+            metadata[PREVIEW_KEY] = make_preview(content)
+            
+            # Random IDs need no counting and can't collide between processes sharing the store
+            doc_id = new_document_id()
+            existing[digest] = doc_id
+            new_ids.append(doc_id)
+            new_contents.append(content)
+            new_metadatas.append(metadata)
+            positions.append(i)
+        
+        if new_contents:
+            # Embed all uncached documents in a single batched forward pass
+            embeddings = np.vstack(embedding_cache.get_or_compute_many(new_contents, embed))
+            
+            failures = {}
+            try:
+                collection.add(
+                    documents=new_contents,
+                    embeddings=embeddings,
+                    metadatas=new_metadatas,
+                    ids=new_ids
+                )
+            except Exception as e:
+                # Chroma rejects the whole batch if any document is invalid (e.g. nested
+                # metadata), so store them one at a time and fail only the offending ones
+                log.info(f"Batch add of {len(new_ids)} documents failed ({e}), retrying individually")
+                for j, doc_id in enumerate(new_ids):
+                    try:
+                        collection.add(
+                            documents=[new_contents[j]],
+                            embeddings=embeddings[j:j + 1],
+                            metadatas=[new_metadatas[j]],
+                            ids=[doc_id]
+                        )
+                    except Exception as item_error:
+                        failures[doc_id] = str(item_error)
+            
+            for position, doc_id in zip(positions, new_ids):
+                if doc_id in failures:
+                    responses[position] = AddDocumentResponse(
+                        status=DocumentStatus.ERROR,
+                        message=failures[doc_id]
+                    ).model_dump()
+                else:
+                    responses[position] = AddDocumentResponse(
+                        status=DocumentStatus.SUCCESS,
+                        id=doc_id
+                    ).model_dump()
+            
+            # Later copies of a failed document in this batch were reported as its duplicates
+            for i, response in enumerate(responses):
+                if response["status"] == DocumentStatus.DUPLICATE and response["id"] in failures:
+                    responses[i] = AddDocumentResponse(
+                        status=DocumentStatus.ERROR,
+                        message=failures[response["id"]]
+                    ).model_dump()
+        
+        return responses
+    
+    # Writes run one batch at a time, so duplicate detection sees every earlier batch
+    write_lock = asyncio.Lock()
+    
+    async def write_documents(entries: List[tuple]) -> List[Dict[str, Any]]:
+        """Run store_documents in a worker thread, one batch at a time"""
+        async with write_lock:
+            responses = await asyncio.to_thread(store_documents, entries)
+        
+        # Cached search results no longer reflect the knowledge base
+        if any(response["status"] == DocumentStatus.SUCCESS for response in responses):
+            search_cache.clear()
+        return responses
+    
+    # Concurrent add_document calls are coalesced so they share one forward pass and one write
+    add_batcher = MicroBatcher(
+        write_documents,
+        max_batch_size=int(os.getenv("ADD_BATCH_SIZE", "32")),
+        max_delay=float(os.getenv("ADD_BATCH_DELAY_MS", "50")) / 1000
+    )
     
     @mcp_instance.tool()
-    def add_document(content: str, metadata: dict = None) -> AddDocumentResponse:
+    async def add_document(content: str, metadata: dict = None) -> AddDocumentResponse:
         """Add a document to the knowledge base"""
         try:
             # Parse and validate the input
@@ -176,42 +515,8 @@ def register_rag_tools(mcp_instance: FastMCP):
             
             # Remove any None values from metadata
             metadata = {k: v for k, v in metadata.items() if v is not None}
-                
-            # Add timestamp if not provided
-            if "created_at" not in metadata:
-                metadata["created_at"] = datetime.now().isoformat()
-            
-            # Check for duplicate content
-            exists, duplicate_id = check_for_duplicate_document(content, collection)
-            
-            if exists:
-                # Return information about the duplicate document
-                return AddDocumentResponse(
-                    status=DocumentStatus.DUPLICATE,
-                    id=duplicate_id,
-                    message=f"Document with this content already exists with ID: {duplicate_id}"
-                ).model_dump()
-            
-            # Get collection data for ID generation
-            collection_data = collection.get()    
-            doc_count = len(collection_data.get("ids", [])) if collection_data else 0
-            doc_id = f"doc_{doc_count + 1}"
             
-            # Embed the document
-            embedding = model.encode(content).tolist()
-            
-            # Add to collection
-            collection.add(
-                documents=[content],
-                embeddings=[embedding],
-                metadatas=[metadata],
-                ids=[doc_id]
-            )
-            
-            return AddDocumentResponse(
-                status=DocumentStatus.SUCCESS,
-                id=doc_id
-            ).model_dump()
+            return await add_batcher.submit((content, metadata))
         except Exception as e:
             print(f"Error in add_document: {str(e)}")
             return AddDocumentResponse(
@@ -220,82 +525,151 @@ def register_rag_tools(mcp_instance: FastMCP):
             ).model_dump()
     
     @mcp_instance.tool()
-    def list_documents() -> List[Document]:
-        """List all documents in the knowledge base"""
-        docs = collection.get()
+    async def add_documents(items: List[AddDocumentRequest]) -> List[AddDocumentResponse]:
+        """Add several documents to the knowledge base in one batch"""
+        try:
+            return await write_documents([
+                (item.content, item.metadata.model_dump(exclude_none=True) if item.metadata else {})
+                for item in items
+            ])
+        except Exception as e:
+            print(f"Error in add_documents: {str(e)}")
+            return [AddDocumentResponse(
+                status=DocumentStatus.ERROR,
+                message=str(e)
+            ).model_dump()] * len(items)
+    
+    @mcp_instance.tool()
+    async def list_documents(limit: int = 100, offset: int = 0) -> List[Document]:
+        """List documents in the knowledge base, one page of `limit` documents starting at `offset`"""
+        # The preview is stored in metadata, so the full document text never leaves Chroma
+        docs = await asyncio.to_thread(collection.get, limit=limit, offset=offset, include=["metadatas"])
         
         # Handle empty collection
         if not docs or "ids" not in docs or not docs["ids"]:
             return []
             
+        metadatas = [
+            (docs["metadatas"][i] if docs.get("metadatas") and i < len(docs["metadatas"]) else None) or {}
+            for i in range(len(docs["ids"]))
+        ]
+        
+        # Documents written since the one-time backfill by something that doesn't record the
+        # internal keys (an older server sharing the store, direct Chroma writes) are filled in
+        # here, which also makes them visible to duplicate detection
+        missing = [doc_id for doc_id, metadata in zip(docs["ids"], metadatas) if PREVIEW_KEY not in metadata]
+        previews = await asyncio.to_thread(fill_internal_metadata, collection, missing) if missing else {}
+        
         results = []
-        for i, doc_id in enumerate(docs["ids"]):
-            # Safe access to document content
-            preview = ""
-            if i < len(docs.get("documents", [])) and docs["documents"][i] is not None:
-                doc_content = docs["documents"][i]
-                preview = doc_content[:100] + "..." if len(doc_content) > 100 else doc_content
-            
-            # Safe access to metadata
-            raw_metadata = {}
-            if docs.get("metadatas") and i < len(docs["metadatas"]) and docs["metadatas"][i] is not None:
-                raw_metadata = docs["metadatas"][i]
-            
-            # Create DocumentMetadata, differentiating between known fields and extra fields
-            known_fields = {"source", "topic", "created_at"}
-            extra_fields = {k: v for k, v in raw_metadata.items() if k not in known_fields}
-            metadata_dict = {k: v for k, v in raw_metadata.items() if k in known_fields}
-            metadata_dict["extra_fields"] = extra_fields
-                
-            # Create Document object
-            document = Document(
+        for doc_id, raw_metadata in zip(docs["ids"], metadatas):
+            # Create Document object; the data comes from Chroma, so skip re-validating it
+            document = Document.model_construct(
                 id=doc_id,
-                preview=preview,
-                metadata=DocumentMetadata(**metadata_dict)
+                preview=raw_metadata.get(PREVIEW_KEY) or previews.get(doc_id, ""),
+                metadata=DocumentMetadata.model_construct(**public_metadata(raw_metadata))
             )
-            results.append(document.model_dump())
+            results.append(document)
                 
         return results
     
+    @mcp_instance.tool()
+    def embedding_cache_info() -> Dict[str, int]:
+        """Report hit/miss statistics for the embedding cache"""
+        return embedding_cache.info()
+    
     @mcp_instance.resource("documents://all")
-    def get_all_documents() -> str:
+    async def get_all_documents() -> str:
         """Retrieve all documents as a resource"""
-        docs = collection.get()
+        def format_documents():
+            # Fetch the collection a page at a time instead of materializing it in one call
+            offset = 0
+            while True:
+                docs = collection.get(limit=PAGE_SIZE, offset=offset, include=["documents"])
+                if not docs or "ids" not in docs or not docs["ids"]:
+                    return
+                
+                documents = docs.get("documents") or []
+                for i, doc_id in enumerate(docs["ids"]):
+                    yield f"--- Document {doc_id} ---\n"
+                    if i < len(documents) and documents[i] is not None:
+                        yield documents[i]
+                        yield "\n\n"
+                    else:
+                        yield "(Document content unavailable)\n\n"
+                offset += len(docs["ids"])
+        
+        # Join every piece once instead of growing a string, which copies the prefix each time
+        formatted = await asyncio.to_thread(lambda: "".join(format_documents()))
         
         # Handle empty collection
-        if not docs or "ids" not in docs or not docs["ids"]:
+        if not formatted:
             return "No documents available in the knowledge base."
-            
-        formatted_docs = ""
-        for i, doc_id in enumerate(docs["ids"]):
-            formatted_docs += f"--- Document {doc_id} ---\n"
-            if i < len(docs.get("documents", [])) and docs["documents"][i] is not None:
-                formatted_docs += docs["documents"][i] + "\n\n"
-            else:
-                formatted_docs += "(Document content unavailable)\n\n"
-                
-        return formatted_docs
+        
+        return formatted
     
     return mcp_instance
 
 def in_memory_rag_tools(mcp_instance: FastMCP):
     """Register RAG-related tools with the MCP server"""
-    in_memory_docs = {}
-        
+    # Document i has ID doc_{i+1}; its content and metadata are at index i of these lists
+    doc_contents = []
+    doc_metadatas = []
+    # Content hash -> document ID, for constant-time duplicate checks
+    hash_to_id = {}
+    
+    # Rank search results by embedding similarity when the model can be loaded,
+    # otherwise fall back to matching query terms
+    try:
+        model = get_embedding_model()
+    except Exception as e:
+        print(f"⚠️ Embedding model unavailable ({str(e)}), using keyword search")
+        model = None
+    
+    # Keyword index used when there is no model; scored by a compiled kernel if Numba is installed
+    lexical_scorer = LexicalScorer()
+    
+    # With SimSIMD available, embeddings are kept as int8 codes with one scale per
+    # vector (a quarter of the float32 memory) and scored with its int8 dot kernel
+    quantize = simsimd is not None
+    
+    # Row i of the embedding matrix (and entry i of the scales) belongs to document i.
+    # Both are preallocated on the first add and doubled when full, so appends are
+    # amortized O(1) and searches scan one contiguous block of the first embedded_count rows
+    embedding_matrix = None
+    embedding_scales = None
+    embedded_count = 0
+
+    def append_embedding(embedding: np.ndarray) -> None:
+        """Store a document's embedding in the next free row, growing the matrix if needed"""
+        nonlocal embedding_matrix, embedding_scales, embedded_count
+        if quantize:
+            row, scale = quantize_int8(embedding)
+        else:
+            row, scale = embedding, 1.0
+
+        if embedding_matrix is None:
+            embedding_matrix = np.empty((IN_MEMORY_INITIAL_CAPACITY, row.shape[0]), dtype=row.dtype)
+            embedding_scales = np.empty(IN_MEMORY_INITIAL_CAPACITY, dtype=np.float64)
+        elif embedded_count == len(embedding_matrix):
+            embedding_matrix = np.concatenate([embedding_matrix, np.empty_like(embedding_matrix)])
+            embedding_scales = np.concatenate([embedding_scales, np.empty_like(embedding_scales)])
+
+        embedding_matrix[embedded_count] = row
+        embedding_scales[embedded_count] = scale
+        embedded_count += 1
+
     # Helper function to check for duplicate documents
-    def check_for_duplicate_document(content):
+    def check_for_duplicate_document(content_digest):
         """Check if a document with the same content already exists in the in-memory storage.
         
         Args:
-            content: The document content to check
+            content_digest: The content hash of the document to check
             
         Returns:
             Tuple of (exists: bool, document_id: str or None)
         """
-        for doc_id, doc_data in in_memory_docs.items():
-            if doc_data["content"] == content:
-                return True, doc_id
-        return False, None
+        doc_id = hash_to_id.get(content_digest)
+        return doc_id is not None, doc_id
     
     @mcp_instance.tool()
     def add_document(content: str, metadata: Dict[str, Any] = None) -> Dict[str, Any]:
@@ -310,7 +684,8 @@ def in_memory_rag_tools(mcp_instance: FastMCP):
                 metadata["created_at"] = datetime.now().isoformat()
             
             # Check for duplicate content
-            exists, duplicate_id = check_for_duplicate_document(content)
+            digest = content_hash(content)
+            exists, duplicate_id = check_for_duplicate_document(digest)
             
             if exists:
                 # Return information about the duplicate document
@@ -321,13 +696,19 @@ def in_memory_rag_tools(mcp_instance: FastMCP):
                 }
             
             # Generate a document ID
-            doc_id = f"doc_{len(in_memory_docs) + 1}"
-            
+            doc_id = f"doc_{len(doc_contents) + 1}"
+
+            # Embed before storing anything, so a failure leaves no partial document
+            if model is not None:
+                embedding = model.encode(content, convert_to_numpy=True, normalize_embeddings=True)
+                append_embedding(np.asarray(embedding, dtype=np.float32))
+            else:
+                lexical_scorer.add(content)
+
             # Add to in-memory collection
-            in_memory_docs[doc_id] = {
-                "content": content,
-                "metadata": metadata
-            }
+            doc_contents.append(content)
+            doc_metadatas.append(metadata)
+            hash_to_id[digest] = doc_id
             
             return {
                 "status": "success",
@@ -340,38 +721,71 @@ def in_memory_rag_tools(mcp_instance: FastMCP):
                 "message": str(e)
             }
     
+    @mcp_instance.tool()
+    def add_documents(items: List[AddDocumentRequest]) -> List[Dict[str, Any]]:
+        """Add several documents to the knowledge base in one batch"""
+        return [
+            add_document(item.content, item.metadata.model_dump(exclude_none=True) if item.metadata else None)
+            for item in items
+        ]
+    
     @mcp_instance.tool()
     def list_documents() -> List[Dict[str, Any]]:
         """List all documents in the knowledge base"""
         results = []
-        for doc_id, doc_data in in_memory_docs.items():
-            content = doc_data["content"]
-            preview = content[:100] + "..." if len(content) > 100 else content
-            
+        for i, (content, metadata) in enumerate(zip(doc_contents, doc_metadatas)):
+            preview = make_preview(content)
+
             results.append({
-                "id": doc_id,
+                "id": f"doc_{i + 1}",
                 "preview": preview,
-                "metadata": doc_data["metadata"]
+                "metadata": metadata
             })
         
         return results
     
+    def semantic_search(query: str, top_k: int) -> List[Dict[str, Any]]:
+        """Score every document against the query with one matrix-vector product"""
+        matrix = embedding_matrix[:embedded_count]
+        query_embedding = np.asarray(model.encode(query, convert_to_numpy=True, normalize_embeddings=True), dtype=np.float32)
+        # Embeddings are unit length, so the dot product is the cosine similarity
+        if quantize:
+            # Integer dot products, rescaled by both vectors' scales
+            query_codes, query_scale = quantize_int8(query_embedding)
+            dots = np.asarray(simsimd.cdist(query_codes[np.newaxis, :], matrix, metric="dot"))[0]
+            # Rounding error can push a near-identical document just past 1, which no cosine reaches
+            scores = np.minimum(dots * embedding_scales[:embedded_count] * query_scale, 1.0)
+        else:
+            scores = matrix @ query_embedding
+        
+        # Select the top_k without sorting every score, then order just those
+        k = min(top_k, len(scores))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        
+        return [{
+            "document": doc_contents[i],
+            "metadata": doc_metadatas[i],
+            "score": float(scores[i])
+        } for i in top]
+    
     @mcp_instance.tool()
     def rag_search(query: str, top_k: int = 3) -> List[Dict[str, Any]]:
         """Search the knowledge base for information (simple implementation)"""
-        # Very simple search - check if query terms are in the content
-        query_terms = query.lower().split()
+        if model is not None and embedded_count:
+            return semantic_search(query, top_k)
+        
+        # Very simple search - score each document by the fraction of query terms it contains
+        scores = lexical_scorer.score(query)
         matches = []
         
-        for doc_id, doc_data in in_memory_docs.items():
-            content = doc_data["content"].lower()
-            # Count how many query terms appear in the content
-            score = sum(1 for term in query_terms if term in content) / len(query_terms) if query_terms else 0
-            
+        for content, metadata, score in zip(doc_contents, doc_metadatas, scores.tolist()):
             if score > 0:
                 matches.append({
-                    "document": doc_data["content"],
-                    "metadata": doc_data["metadata"],
+                    "document": content,
+                    "metadata": metadata,
                     "score": score
                 })
         